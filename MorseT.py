@@ -1,28 +1,66 @@
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for
 from database_handler import MorseDBHandler
-from static.js.design import setup_js_route
+from auth_handler import LoginVerifier, LoginRejected
+from change_notifier import ChangeNotifier
+from static_assets import StaticAssetPipeline
 import os
 import json
-from datetime import datetime
+import threading
+import zlib
 from cryptography.fernet import Fernet
-import bcrypt
 
-def load_config():
-    """Load the config file containing hashed passwords."""
-    with open("config.json", "r") as file:
-        config = json.load(file)
-    return config
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    orjson = None
+
+def dump_json(payload):
+    """Serialize a payload to compact JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
 
 class FlaskMorseApp:
+    # Messages rendered into the page and returned per request by default
+    PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 500
+    # Fields sent to the client in the compact column format
+    MESSAGE_COLUMNS = (
+        'id', 'vessel_sender', 'vessel_recipient', 'message_received',
+        'message_sent', 'timestamp_epoch', 'header', 'timestamp'
+    )
+
     def __init__(self):
         self.app = Flask(__name__)
         self.app.secret_key = os.getenv('FLASK_SECRET_KEY', 'default_fallback_key')  # Replace fallback with a secure value
         self.app.config['SESSION_TYPE'] = 'filesystem'
-        setup_js_route(self.app)
-        self.config = load_config()
+        self.assets = self.build_assets()
+        self.auth = self.initialize_auth()
         self.db = self.initialize_database()
+        self.notifier = ChangeNotifier(self.db.db_path)
+        self._vessels = None
+        # Bumped on every invalidation so a refill racing with a write is discarded
+        self._cache_generation = 0
+        self._cache_lock = threading.Lock()
+        self.notifier.subscribe(self.invalidate_caches)
+        # Writes from this process update the ETag fingerprint immediately
+        self.db.add_write_listener(self.notifier.poke)
         self.setup_routes()
     
+    def build_assets(self):
+        """Build the hashed, precompressed static assets used by the templates."""
+        assets = StaticAssetPipeline(self.app)
+        assets.add_file('js/design.js')
+        assets.add_file('js/auth.js')
+        assets.add_file('css/design.css')
+        assets.add_file('css/auth.css')
+        return assets
+
+    def initialize_auth(self):
+        """Initialize login verification against config.json next to this file."""
+        current_dir = os.path.dirname(os.path.abspath(__file__))
+        return LoginVerifier(os.path.join(current_dir, 'config.json'))
+
     def initialize_database(self):
         """Initialize the database connection."""
         current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -38,8 +76,11 @@ class FlaskMorseApp:
             if request.method == 'POST':
                 username = request.form['username']
                 password = request.form['password']
-                user_password_hash = self.config['users'].get(username)
-                if user_password_hash and bcrypt.checkpw(password.encode(), user_password_hash.encode()):
+                try:
+                    valid = self.auth.verify(username, password, request.remote_addr)
+                except LoginRejected as e:
+                    return render_template('auth.html', error_message=str(e)), 429
+                if valid:
                     # Successful login
                     session['user'] = username
                     return redirect(url_for('index'))
@@ -60,12 +101,10 @@ class FlaskMorseApp:
             if 'user' not in session:
                 return redirect(url_for('login'))
 
-            messages = self.get_messages()
-            vessels = self.db.get_unique_vessels()
             return render_template(
                 'index.html', 
-                messages=self.format_messages(messages), 
-                vessels=vessels, 
+                messages=self.get_messages(limit=self.PAGE_SIZE), 
+                vessels=self.get_vessels(), 
                 current_channel="All"
             )
         
@@ -74,16 +113,14 @@ class FlaskMorseApp:
             """Get messages for a specific vessel."""
             if 'user' not in session:
                 return redirect(url_for('login'))
-            messages = self.db.get_messages(vessel_sender=vessel, vessel_recipient=None)
-            return jsonify(self.format_messages(messages))
+            return self.messages_response(vessel_sender=vessel)
         
         @self.app.route('/get_messages')
         def get_all_messages():
             """Get all messages."""
             if 'user' not in session:
                 return redirect(url_for('login'))
-            messages = self.get_messages()
-            return jsonify(self.format_messages(messages))
+            return self.messages_response()
         
         @self.app.route('/send_message', methods=['POST'])
         def send_message():
@@ -100,28 +137,80 @@ class FlaskMorseApp:
                 return redirect(url_for('login'))
             return jsonify({'status': 'success'})
     
-    def format_messages(self, messages):
-        """Format messages to include clear sender/receiver information."""
-        formatted_messages = []
-        for msg in messages:
-            formatted_msg = msg.copy()
-            formatted_msg['header'] = f"From: {msg['vessel_sender']} To: {msg['vessel_recipient']}"
-            formatted_msg['formatted_time'] = datetime.strptime(
-                msg['timestamp'], '%Y-%m-%d %H:%M:%S'
-            ).strftime('%Y-%m-%d %H:%M:%S')
-            formatted_messages.append(formatted_msg)
-        return formatted_messages
+    def get_vessels(self):
+        """Return the vessel list, cached until the notifier reports a write."""
+        self.notifier.ensure_running()
+        vessels = self._vessels
+        if vessels is None:
+            generation = self._cache_generation
+            vessels = self.db.get_unique_vessels()
+            with self._cache_lock:
+                if generation == self._cache_generation:
+                    self._vessels = vessels
+        return vessels
+    
+    def invalidate_caches(self):
+        """Drop cached query results after a write from any process."""
+        with self._cache_lock:
+            self._cache_generation += 1
+            self._vessels = None
     
-    def get_messages(self):
-        """Retrieve all messages from the database."""
-        messages = self.db.get_messages()
-        messages.sort(key=lambda x: x['timestamp'])
-        return messages
+    def get_messages(self, vessel_sender=None, limit=None, before_id=None):
+        """Retrieve one page of messages, newest first, ready for display."""
+        return self.db.get_messages(
+            vessel_sender=vessel_sender,
+            vessel_recipient=None,
+            limit=limit or self.PAGE_SIZE,
+            before_id=before_id
+        )
+    
+    def messages_response(self, vessel_sender=None):
+        """
+        Build the JSON response for a page of messages.
+
+        Query parameters: ``limit`` and ``before`` (id of the oldest message
+        already shown) page through history, and ``format=columns`` returns
+        a compact ``{"columns": [...], "rows": [[...], ...]}`` payload
+        instead of a list of objects.
+
+        Responses carry an ETag derived from the database fingerprint, so
+        polling clients get a 304 until some worker writes a message.
+        """
+        etag = f"{self.notifier.fingerprint}-{zlib.crc32(request.full_path.encode()):08x}"
+        headers = {'ETag': f'"{etag}"', 'Cache-Control': 'private, no-cache'}
+        if etag in request.if_none_match:
+            return self.app.response_class(status=304, headers=headers)
+
+        limit = min(request.args.get('limit', self.PAGE_SIZE, type=int), self.MAX_PAGE_SIZE)
+        before_id = request.args.get('before', type=int)
+        messages = self.get_messages(vessel_sender, limit=max(limit, 1), before_id=before_id)
+
+        if request.args.get('format') == 'columns':
+            payload = {
+                'columns': self.MESSAGE_COLUMNS,
+                'rows': [[msg[column] for column in self.MESSAGE_COLUMNS] for msg in messages]
+            }
+        else:
+            payload = messages
+        return self.app.response_class(dump_json(payload), mimetype='application/json', headers=headers)
     
     def run(self, debug=True, host='0.0.0.0'):
         """Run the Flask application."""
         self.app.run(debug=debug, host=host)
 
+def create_app():
+    """
+    Application factory for WSGI servers, e.g.
+    ``gunicorn -w 4 --worker-class gthread --threads 16 wsgi:app``. Use a
+    threaded worker class so the bounded login pool leaves threads free
+    for the message endpoints.
+
+    Safe to call before a pre-fork server forks: database connections are
+    opened per request, and the login pool and change notifier start their
+    threads lazily in each worker process.
+    """
+    return FlaskMorseApp().app
+
 if __name__ == '__main__':
     app = FlaskMorseApp()
     app.run(debug=True)
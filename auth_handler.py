@@ -0,0 +1,230 @@
+# auth_handler.py
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import bcrypt
+
+
+def load_config(config_path="config.json"):
+    """Load the config file containing hashed passwords."""
+    with open(config_path, "r") as file:
+        config = json.load(file)
+    return config
+
+
+# Used for anything missing from the optional "login" section of config.json.
+# Limits are [max attempts, window in seconds].
+DEFAULT_LOGIN_SETTINGS = {
+    'max_workers': 2,
+    'max_pending': 8,
+    'timeout': 10,
+    'ip_limit': [100, 60],
+    'user_limit': [5, 60],
+}
+
+
+def validate_config(config):
+    """
+    Check a loaded config and return (users, login settings).
+
+    Raises ValueError describing the first problem found, so a broken file
+    can be refused before anything is applied.
+    """
+    if not isinstance(config, dict):
+        raise ValueError("config must be a JSON object")
+    users = config.get('users')
+    if not isinstance(users, dict) or not all(
+            isinstance(name, str) and isinstance(password_hash, str)
+            for name, password_hash in users.items()):
+        raise ValueError("'users' must map usernames to password hash strings")
+
+    login = config.get('login', {})
+    if not isinstance(login, dict):
+        raise ValueError("'login' must be a JSON object")
+    settings = {**DEFAULT_LOGIN_SETTINGS, **login}
+    for key in ('max_workers', 'max_pending'):
+        value = settings[key]
+        if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+            raise ValueError(f"login.{key} must be a positive integer")
+    timeout = settings['timeout']
+    if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0:
+        raise ValueError("login.timeout must be a positive number")
+    for key in ('ip_limit', 'user_limit'):
+        limit = settings[key]
+        if not isinstance(limit, list) or len(limit) != 2 or not all(
+                isinstance(v, int) and not isinstance(v, bool) and v > 0 for v in limit):
+            raise ValueError(f"login.{key} must be [max attempts, window seconds] as positive integers")
+    return dict(users), settings
+
+
+class LoginRejected(Exception):
+    """Raised when a login attempt is refused before its password is checked"""
+
+
+class RateLimiter:
+    """
+    Sliding-window attempt counter keyed by an arbitrary string.
+
+    State lives in the current process only, so with N worker processes a
+    client can make up to N times max_attempts per window in total.
+    """
+
+    def __init__(self, max_attempts, window):
+        self.max_attempts = max_attempts
+        self.window = window
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def hit(self, key):
+        """Record an attempt and return False if the key is over its limit"""
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._attempts.setdefault(key, deque())
+            while attempts and attempts[0] <= now - self.window:
+                attempts.popleft()
+            if len(attempts) >= self.max_attempts:
+                return False
+            attempts.append(now)
+
+            # Drop idle keys now and then so the table cannot grow without bound
+            if len(self._attempts) > 10000:
+                self._attempts = {k: v for k, v in self._attempts.items()
+                                  if v and v[-1] > now - self.window}
+            return True
+
+
+class LoginVerifier:
+    """
+    Checks credentials against the bcrypt hashes in config.json.
+
+    Hashing runs in a small dedicated pool with a bounded backlog. The
+    request thread still waits for its result, so the pool does not free
+    that thread; what it does is cap how many request threads logins can
+    hold at once (pool size plus backlog). Attempts beyond that are rejected
+    immediately. With a threaded server whose thread count exceeds that cap
+    (see wsgi.py), the remaining threads stay free for the message
+    endpoints. Attempts are also rate limited per client address and per
+    username, unknown usernames are rejected without hashing, and the
+    config file is reloaded when it changes on disk.
+
+    Settings come from the optional "login" section of config.json (see
+    DEFAULT_LOGIN_SETTINGS). The rate limits are picked up on reload; pool
+    size, backlog and timeout are read once at startup. Pool, backlog and
+    rate limits all apply per worker process.
+    """
+
+    def __init__(self, config_path, reload_interval=1.0):
+        self.config_path = config_path
+        self.reload_interval = reload_interval
+        self.logger = logging.getLogger(__name__)
+
+        self._config_lock = threading.Lock()
+        self._config_mtime = None
+        self._next_reload_check = 0
+        self.users = {}
+        self.ip_limiter = RateLimiter(*DEFAULT_LOGIN_SETTINGS['ip_limit'])
+        self.user_limiter = RateLimiter(*DEFAULT_LOGIN_SETTINGS['user_limit'])
+        # Fail at startup rather than run with no users
+        settings = self.reload_config(initial=True)
+
+        self.max_workers = settings['max_workers']
+        self.timeout = settings['timeout']
+        self._slots = threading.BoundedSemaphore(settings['max_workers'] + settings['max_pending'])
+
+        self._executor = None
+        self._executor_pid = None
+        self._executor_lock = threading.Lock()
+
+    def reload_config(self, initial=False):
+        """
+        Reload users and rate limits if config.json changed since the last load.
+
+        Returns the login settings that were loaded, or None if nothing
+        changed. On the initial load errors are raised; on later reloads
+        they are logged and the previous settings are kept.
+        """
+        with self._config_lock:
+            try:
+                mtime = os.stat(self.config_path).st_mtime_ns
+                if mtime == self._config_mtime:
+                    return None
+                users, settings = validate_config(load_config(self.config_path))
+            except (OSError, ValueError) as e:
+                if initial:
+                    self.logger.error(f"Error loading config {self.config_path}: {str(e)}")
+                    raise
+                # Keep serving with the previous users if the new file is broken
+                self.logger.error(f"Error reloading config: {str(e)}")
+                return None
+
+            # Everything is validated, so apply users and limits together
+            self.users = users
+            self.ip_limiter.max_attempts, self.ip_limiter.window = settings['ip_limit']
+            self.user_limiter.max_attempts, self.user_limiter.window = settings['user_limit']
+            self._config_mtime = mtime
+            self.logger.info(f"Loaded {len(self.users)} users from {self.config_path}")
+            return settings
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now >= self._next_reload_check:
+            self._next_reload_check = now + self.reload_interval
+            self.reload_config()
+
+    def _get_executor(self):
+        with self._executor_lock:
+            # Worker threads do not survive fork, so each process builds its own pool
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix='login-verify'
+                )
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def verify(self, username, password, remote_addr=None):
+        """
+        Return True if the credentials are valid, False otherwise.
+
+        Raises LoginRejected when the client is rate limited or the
+        verification backlog is full.
+        """
+        self._maybe_reload()
+
+        if not self.ip_limiter.hit(remote_addr or 'unknown'):
+            self.logger.warning(f"Login rate limit hit for address {remote_addr}")
+            raise LoginRejected("Too many login attempts, please wait and try again.")
+
+        password_hash = self.users.get(username)
+        if not password_hash:
+            self.logger.info(f"Login rejected for unknown user: {username}")
+            return False
+
+        if not self.user_limiter.hit(username):
+            self.logger.warning(f"Login rate limit hit for user {username}")
+            raise LoginRejected("Too many login attempts, please wait and try again.")
+
+        if not self._slots.acquire(blocking=False):
+            self.logger.warning("Login verification backlog full, rejecting attempt")
+            raise LoginRejected("The server is busy, please try again shortly.")
+
+        try:
+            future = self._get_executor().submit(
+                bcrypt.checkpw, password.encode(), password_hash.encode()
+            )
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            self.logger.error(f"Login verification timed out for user {username}")
+            raise LoginRejected("The server is busy, please try again shortly.")
+        except ValueError as e:
+            self.logger.error(f"Invalid password hash for user {username}: {str(e)}")
+            return False
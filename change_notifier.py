@@ -0,0 +1,108 @@
+# change_notifier.py
+import os
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+
+
+class ChangeNotifier:
+    """
+    Detects writes to the messages database made by any process.
+
+    One background thread per process polls ``PRAGMA data_version`` on its
+    own connection; the value changes whenever another connection commits.
+    On a change the notifier recomputes a fingerprint of the messages table
+    that is identical in every worker, so it can be used in ETags, and calls
+    the registered callbacks so per-process caches can be dropped.
+
+    The fingerprint is built from MAX(id) and the AUTOINCREMENT sequence,
+    both cheap lookups. Ids are never reused, so it changes on every insert
+    and when the newest rows are deleted or the table is cleared; the app
+    has no path that deletes or edits older rows.
+
+    Writes made by this process should call poke() after committing, so the
+    fingerprint is current for the very next request instead of after the
+    next poll.
+
+    The thread and its connection are created on first use in each process,
+    which keeps the notifier safe to build before a pre-fork server forks.
+    """
+
+    def __init__(self, db_path, interval=0.05):
+        self.db_path = db_path
+        self.interval = interval
+        self.logger = logging.getLogger(__name__)
+
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._pid = None
+        self._fingerprint = None
+
+    def subscribe(self, callback):
+        """Register a callable invoked (with no arguments) after each detected change"""
+        self._callbacks.append(callback)
+
+    @property
+    def fingerprint(self):
+        """A short string that changes whenever the messages table changes"""
+        self.ensure_running()
+        return self._fingerprint
+
+    def poke(self):
+        """Refresh the fingerprint and run the callbacks now, after a local write"""
+        self.ensure_running()
+        with closing(sqlite3.connect(self.db_path, timeout=20)) as conn:
+            self._changed(conn)
+
+    def ensure_running(self):
+        """Start the polling thread if this process does not have one yet"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            # Threads do not survive fork, so a forked worker starts its own
+            conn = sqlite3.connect(self.db_path, timeout=20, check_same_thread=False)
+            # Read the version first so a commit landing before the fingerprint
+            # query is still seen as a change by the polling thread
+            version = self._data_version(conn)
+            self._fingerprint = self._compute_fingerprint(conn)
+            thread = threading.Thread(
+                target=self._run, args=(conn, version), name='db-change-notifier', daemon=True
+            )
+            thread.start()
+            self._pid = pid
+            self.logger.info(f"Change notifier started in process {pid}")
+
+    def _data_version(self, conn):
+        return conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def _compute_fingerprint(self, conn):
+        max_id, seq = conn.execute('''
+            SELECT (SELECT MAX(id) FROM messages),
+                   (SELECT seq FROM sqlite_sequence WHERE name = 'messages')
+        ''').fetchone()
+        return f"{max_id or 0}-{seq or 0}"
+
+    def _changed(self, conn):
+        self._fingerprint = self._compute_fingerprint(conn)
+        self.logger.debug(f"Database changed, fingerprint now {self._fingerprint}")
+        for callback in list(self._callbacks):
+            try:
+                callback()
+            except Exception as e:
+                self.logger.error(f"Change callback failed: {str(e)}")
+
+    def _run(self, conn, last_version):
+        while True:
+            try:
+                version = self._data_version(conn)
+                if version != last_version:
+                    self._changed(conn)
+                last_version = version
+            except sqlite3.Error as e:
+                self.logger.error(f"Error polling database version: {str(e)}")
+            time.sleep(self.interval)
@@ -2,6 +2,7 @@
 import sqlite3
 from cryptography.fernet import Fernet, InvalidToken
 import os
+import hashlib
 import logging
 from datetime import datetime
 
@@ -9,6 +10,15 @@ class MorseDBHandler:
     # Predefined static encryption key
     PREDEFINED_KEY = b'd99vdna1RPR21BrXlXL5CVVSQVVAEsLqXgNU22v_Xwk='
 
+    # Secondary indexes used for paging; the bulk importer can drop and rebuild these
+    SECONDARY_INDEXES = {
+        'idx_messages_time': 'CREATE INDEX IF NOT EXISTS idx_messages_time ON messages (timestamp_epoch, id)',
+        'idx_messages_sender_time': (
+            'CREATE INDEX IF NOT EXISTS idx_messages_sender_time '
+            'ON messages (vessel_sender, timestamp_epoch, id)'
+        ),
+    }
+
     def __init__(self, db_path):
         """Initialize database handler with encryption"""
         self.db_path = os.path.abspath(os.path.normpath(db_path))
@@ -18,6 +28,9 @@ class MorseDBHandler:
         self.logger = logging.getLogger(__name__)
         self.logger.info(f"Initializing database handler for path: {self.db_path}")
         
+        # Callables run after this handler commits a write, see add_write_listener
+        self._write_listeners = []
+
         # Setup encryption and database
         self._setup_encryption()
         self._setup_database()
@@ -39,7 +52,12 @@ class MorseDBHandler:
             
             with sqlite3.connect(self.db_path, timeout=20) as conn:
                 cursor = conn.cursor()
-                
+
+                # WAL lets several worker processes read while one writes
+                cursor.execute('PRAGMA journal_mode=WAL')
+                # Serialize schema setup between workers starting at the same time
+                cursor.execute('BEGIN IMMEDIATE')
+
                 self.logger.debug("Creating messages table if not exists")
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS messages (
@@ -48,10 +66,22 @@ class MorseDBHandler:
                         vessel_recipient TEXT NOT NULL,
                         message_received TEXT,
                         message_sent TEXT,
-                        timestamp DATETIME DEFAULT (datetime('now', 'localtime'))
+                        timestamp DATETIME DEFAULT (datetime('now', 'localtime')),
+                        timestamp_epoch INTEGER,
+                        header TEXT,
+                        content_hash TEXT
                     )
                 ''')
-                
+
+                self._migrate_columns(cursor)
+                for statement in self.SECONDARY_INDEXES.values():
+                    cursor.execute(statement)
+                # Lets both write paths skip messages that are already stored
+                cursor.execute('''
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_content_hash
+                    ON messages (content_hash)
+                ''')
+
                 conn.commit()
                 self.logger.info("Database setup completed successfully")
                 
@@ -59,6 +89,63 @@ class MorseDBHandler:
             self.logger.error(f"Database setup error: {str(e)}")
             raise
     
+    def _migrate_columns(self, cursor):
+        """Add and backfill the precomputed columns on databases created before they existed"""
+        cursor.execute('PRAGMA table_info(messages)')
+        columns = {row[1] for row in cursor.fetchall()}
+        needs_backfill = 'timestamp_epoch' not in columns or 'header' not in columns
+        if 'timestamp_epoch' not in columns:
+            self.logger.info("Adding timestamp_epoch column")
+            cursor.execute('ALTER TABLE messages ADD COLUMN timestamp_epoch INTEGER')
+        if 'header' not in columns:
+            self.logger.info("Adding header column")
+            cursor.execute('ALTER TABLE messages ADD COLUMN header TEXT')
+        if 'content_hash' not in columns:
+            self.logger.info("Adding content_hash column")
+            cursor.execute('ALTER TABLE messages ADD COLUMN content_hash TEXT')
+
+        # Only scan the table once, when the columns are first added
+        if not needs_backfill:
+            return
+
+        # Timestamps are stored as local time, so convert back to UTC for the epoch
+        cursor.execute('''
+            UPDATE messages
+            SET timestamp_epoch = CAST(strftime('%s', timestamp, 'utc') AS INTEGER),
+                header = 'From: ' || vessel_sender || ' To: ' || vessel_recipient
+            WHERE timestamp_epoch IS NULL OR header IS NULL
+        ''')
+        if cursor.rowcount > 0:
+            self.logger.info(f"Backfilled precomputed columns for {cursor.rowcount} messages")
+
+    def add_write_listener(self, callback):
+        """Register a callable invoked (with no arguments) after this handler commits a write"""
+        self._write_listeners.append(callback)
+
+    def _notify_write(self):
+        for callback in list(self._write_listeners):
+            try:
+                callback()
+            except Exception as e:
+                self.logger.error(f"Write listener failed: {str(e)}")
+
+    @staticmethod
+    def format_metadata(vessel_sender, vessel_recipient, when):
+        """Return the (timestamp, epoch, header) values stored alongside a message"""
+        when = when.replace(microsecond=0)
+        return (
+            when.strftime('%Y-%m-%d %H:%M:%S'),
+            int(when.timestamp()),
+            f"From: {vessel_sender} To: {vessel_recipient}"
+        )
+
+    @staticmethod
+    def content_hash(vessel_sender, vessel_recipient, message_received, message_sent, timestamp):
+        """Return the deduplication hash of a message's plaintext fields"""
+        return hashlib.sha256('\x1f'.join((
+            vessel_sender, vessel_recipient, message_received or '', message_sent or '', timestamp
+        )).encode()).hexdigest()
+
     def encrypt_message(self, message):
         """Encrypt a message with error handling"""
         try:
@@ -104,8 +191,16 @@ class MorseDBHandler:
         
         try:
             # Encrypt the messages if they are not None
-            encrypted_received = self.encrypt_message(message_received.strip()) if message_received else None
-            encrypted_sent = self.encrypt_message(message_sent.strip()) if message_sent else None
+            message_received = message_received.strip() if message_received else ''
+            message_sent = message_sent.strip() if message_sent else ''
+            encrypted_received = self.encrypt_message(message_received) if message_received else None
+            encrypted_sent = self.encrypt_message(message_sent) if message_sent else None
+            timestamp, timestamp_epoch, header = self.format_metadata(
+                vessel_sender, vessel_recipient, datetime.now()
+            )
+            content_hash = self.content_hash(
+                vessel_sender, vessel_recipient, message_received, message_sent, timestamp
+            )
             
             # Save to database with explicit transaction
             with sqlite3.connect(self.db_path, timeout=20) as conn:
@@ -115,21 +210,28 @@ class MorseDBHandler:
                 
                 try:
                     cursor.execute('''
-                        INSERT INTO messages (vessel_sender, vessel_recipient, message_received, message_sent)
-                        VALUES (?, ?, ?, ?)
-                    ''', (vessel_sender, vessel_recipient, encrypted_received, encrypted_sent))
+                        INSERT INTO messages (vessel_sender, vessel_recipient, message_received, message_sent,
+                                              timestamp, timestamp_epoch, header, content_hash)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', (vessel_sender, vessel_recipient, encrypted_received, encrypted_sent,
+                          timestamp, timestamp_epoch, header, content_hash))
                     
                     # Verify the insertion
                     cursor.execute('SELECT changes()')
                     if cursor.fetchone()[0] == 1:
                         conn.commit()
                         self.logger.info(f"Message saved successfully from {vessel_sender} to {vessel_recipient}")
+                        self._notify_write()
                         return True
                     else:
                         conn.rollback()
                         self.logger.warning("No changes made to database")
                         return False
                         
+                except sqlite3.IntegrityError:
+                    conn.rollback()
+                    self.logger.warning("Identical message already stored for this second, not saved again")
+                    return False
                 except sqlite3.Error as e:
                     conn.rollback()
                     self.logger.error(f"Database error in transaction: {str(e)}")
@@ -143,16 +245,21 @@ class MorseDBHandler:
             return False
 
     
-    def get_messages(self, vessel_sender=None, vessel_recipient=None, limit=100):
+    def get_messages(self, vessel_sender=None, vessel_recipient=None, limit=100, before_id=None):
         """
-        Retrieve and decrypt messages from database.
+        Retrieve and decrypt messages from database, newest first.
+
+        Pass the id of the oldest message already shown as before_id to fetch the next page.
         """
         self.logger.info(f"Retrieving messages for sender: {vessel_sender} and recipient: {vessel_recipient}")
 
         try:
             with sqlite3.connect(self.db_path, timeout=20) as conn:
                 cursor = conn.cursor()
-                query = 'SELECT id, vessel_sender, vessel_recipient, message_received, message_sent, timestamp FROM messages '
+                query = (
+                    'SELECT id, vessel_sender, vessel_recipient, message_received, message_sent, '
+                    'timestamp, timestamp_epoch, header FROM messages '
+                )
                 conditions = []
                 params = []
 
@@ -162,10 +269,15 @@ class MorseDBHandler:
                 if vessel_recipient:
                     conditions.append("vessel_recipient = ?")
                     params.append(vessel_recipient)
+                if before_id:
+                    conditions.append(
+                        "(timestamp_epoch, id) < (SELECT timestamp_epoch, id FROM messages WHERE id = ?)"
+                    )
+                    params.append(before_id)
 
                 if conditions:
                     query += "WHERE " + " AND ".join(conditions)
-                query += " ORDER BY timestamp DESC LIMIT ?"
+                query += " ORDER BY timestamp_epoch DESC, id DESC LIMIT ?"
                 params.append(limit)
 
                 cursor.execute(query, tuple(params))
@@ -180,7 +292,9 @@ class MorseDBHandler:
                             'vessel_recipient': row[2],
                             'message_received': decrypted_received,
                             'message_sent': decrypted_sent,
-                            'timestamp': row[5]
+                            'timestamp': row[5],
+                            'timestamp_epoch': row[6],
+                            'header': row[7]
                         })
                         self.logger.debug(f"Successfully processed message ID: {row[0]}")
                     except Exception as e:
@@ -206,7 +320,8 @@ class MorseDBHandler:
                 cursor.execute('DELETE FROM messages')
                 conn.commit()
                 self.logger.info("Database cleared successfully")
-                return True
+            self._notify_write()
+            return True
         except sqlite3.Error as e:
             self.logger.error(f"Error clearing database: {str(e)}")
             return False
@@ -0,0 +1,364 @@
+"""
+Bulk import historical traffic logs into the messages table.
+
+Reads CSV (with a header row) or JSONL files line by line. Each record needs
+vessel_sender and vessel_recipient, at least one of message_received or
+message_sent, and a timestamp (ISO 8601, 'YYYY-MM-DD HH:MM:SS', compact
+'YYYYMMDD[HHMMSS]' or Unix epoch seconds). Records are normalized, hashed and
+encrypted in worker processes, then inserted in large transactions. Rows whose
+content hash is already in the database, whether imported or saved live, are
+skipped, so overlapping logs and interrupted imports can simply be rerun.
+
+With --defer-indexes the paging indexes are dropped for the load and rebuilt
+at the end. Message queries in the web app fall back to full sorts meanwhile,
+so only use it while the app is offline.
+
+Usage:
+    python import_messages.py logs/2019.csv logs/2020.jsonl --workers 8
+"""
+import os
+import sys
+import csv
+import json
+import re
+import time
+import logging
+import argparse
+import sqlite3
+from datetime import datetime
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from cryptography.fernet import Fernet, InvalidToken
+from database_handler import MorseDBHandler
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_VESSEL_LENGTH = 64
+
+# Digit-only strings of this shape are epoch seconds (1973 onwards); shorter
+# ones such as '20190101' are compact dates instead
+EPOCH_PATTERN = re.compile(r'\d{9,11}(\.\d+)?')
+COMPACT_FORMATS = {8: '%Y%m%d', 12: '%Y%m%d%H%M', 14: '%Y%m%d%H%M%S'}
+
+# Per-process cipher, created by the pool initializer
+_cipher = None
+
+
+def get_default_db_path():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, 'SQLite Database', 'morse_decoder.db')
+
+
+def normalize_vessel(name):
+    """Collapse whitespace and upper-case a vessel name, or return None if invalid"""
+    if not isinstance(name, str):
+        return None
+    name = ' '.join(name.split()).upper()
+    if not name or len(name) > MAX_VESSEL_LENGTH:
+        return None
+    return name
+
+
+def parse_timestamp(value):
+    """Parse a log timestamp into a naive local datetime, or return None"""
+    # bool is an int subclass, but True is not a timestamp
+    if isinstance(value, bool):
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value)
+        if not isinstance(value, str) or not value.strip():
+            return None
+        value = value.strip()
+        if value.isdigit() and len(value) in COMPACT_FORMATS:
+            return datetime.strptime(value, COMPACT_FORMATS[len(value)])
+        if EPOCH_PATTERN.fullmatch(value):
+            return datetime.fromtimestamp(float(value))
+        when = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (ValueError, OverflowError, OSError):
+        return None
+    if when.tzinfo is not None:
+        # Stored timestamps are local time, like the database default
+        when = when.astimezone().replace(tzinfo=None)
+    return when
+
+
+def _init_worker():
+    global _cipher
+    _cipher = Fernet(MorseDBHandler.PREDEFINED_KEY)
+
+
+def _prepare_batch(records):
+    """
+    Validate, normalize, hash and encrypt a batch of raw records.
+
+    Returns (rows, rejected) where rows are ready for INSERT and rejected is
+    a list of (source, reason) tuples.
+    """
+    rows = []
+    rejected = []
+    for source, record in records:
+        sender = normalize_vessel(record.get('vessel_sender'))
+        recipient = normalize_vessel(record.get('vessel_recipient'))
+        if not sender or not recipient:
+            rejected.append((source, "missing or invalid vessel name"))
+            continue
+
+        received = record.get('message_received') or ''
+        sent = record.get('message_sent') or ''
+        if not isinstance(received, str) or not isinstance(sent, str):
+            rejected.append((source, "invalid message text"))
+            continue
+        received = received.strip()
+        sent = sent.strip()
+        if not received and not sent:
+            rejected.append((source, "no message text"))
+            continue
+
+        when = parse_timestamp(record.get('timestamp'))
+        if when is None:
+            rejected.append((source, f"invalid timestamp {record.get('timestamp')!r}"))
+            continue
+        timestamp, timestamp_epoch, header = MorseDBHandler.format_metadata(sender, recipient, when)
+
+        content_hash = MorseDBHandler.content_hash(sender, recipient, received, sent, timestamp)
+
+        rows.append((
+            sender,
+            recipient,
+            _cipher.encrypt(received.encode()).decode() if received else None,
+            _cipher.encrypt(sent.encode()).decode() if sent else None,
+            timestamp,
+            timestamp_epoch,
+            header,
+            content_hash
+        ))
+    return rows, rejected
+
+
+def read_records(path):
+    """Yield (source, record) pairs from a CSV or JSONL file, one line at a time"""
+    ext = os.path.splitext(path)[1].lower()
+    # utf-8-sig drops the byte order mark Excel writes at the start of CSV exports
+    with open(path, 'r', encoding='utf-8-sig', newline='') as file:
+        if ext == '.csv':
+            reader = csv.DictReader(file)
+            for record in reader:
+                yield f"{path}:{reader.line_num}", record
+        elif ext in ('.jsonl', '.ndjson'):
+            for line_num, line in enumerate(file, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if not isinstance(record, dict):
+                    # Let the worker reject it so it is counted with the rest
+                    record = {}
+                yield f"{path}:{line_num}", record
+        else:
+            raise ValueError(f"Unsupported file type: {path} (expected .csv or .jsonl)")
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class ImportStats:
+    """Counters and periodic progress reporting for an import run"""
+
+    def __init__(self, report_interval):
+        self.report_interval = report_interval
+        self.read = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.started = time.monotonic()
+        self._next_report = self.started + report_interval
+
+    def report(self, force=False):
+        now = time.monotonic()
+        if not force and now < self._next_report:
+            return
+        self._next_report = now + self.report_interval
+        elapsed = max(now - self.started, 1e-9)
+        logger.info(
+            f"{self.read} read, {self.inserted} inserted, {self.duplicates} duplicates, "
+            f"{self.rejected} rejected in {elapsed:.1f}s ({self.read / elapsed:,.0f} rows/s)"
+        )
+
+
+def backfill_content_hashes(conn, batch_size=5000):
+    """
+    Hash stored messages that have no content hash yet, such as rows saved
+    before the column existed, so the import can skip them as duplicates.
+    Rows that cannot be decrypted, or that duplicate an already hashed row,
+    are left without a hash.
+    """
+    cipher = Fernet(MorseDBHandler.PREDEFINED_KEY)
+    last_id = 0
+    hashed = 0
+    while True:
+        rows = conn.execute('''
+            SELECT id, vessel_sender, vessel_recipient, message_received, message_sent, timestamp
+            FROM messages WHERE content_hash IS NULL AND id > ? ORDER BY id LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        updates = []
+        for row_id, sender, recipient, received, sent, timestamp in rows:
+            try:
+                received = cipher.decrypt(received.encode()).decode() if received else ''
+                sent = cipher.decrypt(sent.encode()).decode() if sent else ''
+            except InvalidToken:
+                continue
+            content_hash = MorseDBHandler.content_hash(sender, recipient, received, sent, timestamp)
+            updates.append((content_hash, row_id))
+
+        conn.execute('BEGIN')
+        cursor = conn.executemany('UPDATE OR IGNORE messages SET content_hash = ? WHERE id = ?', updates)
+        conn.execute('COMMIT')
+        hashed += cursor.rowcount
+    if hashed:
+        logger.info(f"Backfilled content hashes for {hashed} existing messages")
+
+
+def rebuild_indexes(db_path):
+    """Recreate the secondary indexes dropped for a deferred-index import"""
+    logger.info("Rebuilding indexes")
+    with sqlite3.connect(db_path, timeout=20) as conn:
+        for statement in MorseDBHandler.SECONDARY_INDEXES.values():
+            conn.execute(statement)
+    conn.close()
+
+
+def import_files(paths, db_path, workers=None, batch_size=5000, commit_every=200000,
+                 report_interval=5.0, max_logged_rejects=20, defer_indexes=False):
+    """
+    Import the given log files and return the ImportStats for the run.
+
+    defer_indexes drops the paging indexes for the load and rebuilds them at
+    the end; only use it while the web app is offline.
+    """
+    # Make sure the schema and migrations are in place before touching it directly
+    MorseDBHandler(db_path)
+
+    workers = workers or os.cpu_count() or 1
+    stats = ImportStats(report_interval)
+    conn = sqlite3.connect(db_path, timeout=20, isolation_level=None)
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA cache_size=-200000')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    backfill_content_hashes(conn, batch_size)
+
+    if defer_indexes:
+        # The content hash index stays in place because deduplication relies on it
+        for index in MorseDBHandler.SECONDARY_INDEXES:
+            conn.execute(f'DROP INDEX IF EXISTS {index}')
+    logger.info(f"Importing with {workers} workers, batches of {batch_size}")
+
+    def records():
+        for path in paths:
+            logger.info(f"Reading {path}")
+            yield from read_records(path)
+
+    pending = []
+    uncommitted = 0
+    try:
+        conn.execute('BEGIN')
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            batches = batched(records(), batch_size)
+            while True:
+                # Keep a bounded number of batches in flight to cap memory use
+                while len(pending) < workers * 2:
+                    batch = next(batches, None)
+                    if batch is None:
+                        break
+                    stats.read += len(batch)
+                    pending.append(pool.submit(_prepare_batch, batch))
+                if not pending:
+                    break
+
+                rows, rejected = pending.pop(0).result()
+                cursor = conn.executemany('''
+                    INSERT OR IGNORE INTO messages (vessel_sender, vessel_recipient, message_received,
+                                                    message_sent, timestamp, timestamp_epoch, header,
+                                                    content_hash)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+                stats.inserted += cursor.rowcount
+                stats.duplicates += len(rows) - cursor.rowcount
+
+                for source, reason in rejected:
+                    stats.rejected += 1
+                    if stats.rejected <= max_logged_rejects:
+                        logger.warning(f"Rejected {source}: {reason}")
+
+                uncommitted += len(rows)
+                if uncommitted >= commit_every:
+                    conn.execute('COMMIT')
+                    conn.execute('BEGIN')
+                    uncommitted = 0
+                stats.report()
+        conn.execute('COMMIT')
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+        if defer_indexes:
+            rebuild_indexes(db_path)
+
+    if stats.rejected > max_logged_rejects:
+        logger.warning(f"{stats.rejected - max_logged_rejects} further rejected rows not shown")
+    stats.report(force=True)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import historical traffic logs (CSV or JSONL)")
+    parser.add_argument('files', nargs='+', help="log files to import")
+    parser.add_argument('--db', default=get_default_db_path(), help="path to the SQLite database")
+    parser.add_argument('--workers', type=int, default=None, help="encryption worker processes")
+    parser.add_argument('--batch-size', type=int, default=5000, help="records per worker batch")
+    parser.add_argument('--commit-every', type=int, default=200000, help="rows per transaction")
+    parser.add_argument('--progress', type=float, default=5.0, help="seconds between progress reports")
+    parser.add_argument('--defer-indexes', action='store_true',
+                        help="drop paging indexes during the load and rebuild them after "
+                             "(faster, but only while the web app is offline)")
+    args = parser.parse_args()
+
+    try:
+        import_files(
+            args.files, args.db,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            commit_every=args.commit_every,
+            report_interval=args.progress,
+            defer_indexes=args.defer_indexes
+        )
+    except KeyboardInterrupt:
+        logger.info("Import interrupted by user, committed rows are kept")
+        sys.exit(1)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        logger.error(f"Import failed: {str(e)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,3 @@
-from flask import url_for
-
-def get_js_content():
-    """
-    Returns the JavaScript content as a string that will be served by Flask
-    """
-    return """
 document.addEventListener('DOMContentLoaded', function() {
     // Menu functionality
     const menuBtn = document.querySelector('.menu-btn');
@@ -93,13 +86,19 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Function to update messages
     function updateMessages(vessel) {
-        const url = vessel ? 
+        const url = (vessel ? 
             `/get_messages/${encodeURIComponent(vessel)}` : 
-            '/get_messages';
+            '/get_messages') + '?format=columns';
         
         fetch(url)
             .then(response => response.json())
-            .then(messages => {
+            .then(data => {
+                // Rebuild message objects from the compact column format
+                const messages = data.rows.map(row => {
+                    const message = {};
+                    data.columns.forEach((column, i) => { message[column] = row[i]; });
+                    return message;
+                });
                 const chatArea = document.querySelector('.chat-area');
                 chatArea.innerHTML = '';
                 
@@ -122,7 +121,7 @@ document.addEventListener('DOMContentLoaded', function() {
                         }
                     }
                     
-                    messageHTML += `<div class="timestamp ${message.message_sent && message.message_sent != '[No Message Sent]' ? 'timestamp-sent' : 'timestamp-received'}">${message.formatted_time}</div>`;
+                    messageHTML += `<div class="timestamp ${message.message_sent && message.message_sent != '[No Message Sent]' ? 'timestamp-sent' : 'timestamp-received'}">${message.timestamp}</div>`;
                     
                     messageGroup.innerHTML = messageHTML;
                     chatArea.appendChild(messageGroup);
@@ -133,13 +132,7 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     }
 
-    // Initial messages load
-    updateMessages(null);
+    // The latest page is rendered by the server, so just scroll to it
+    const chatArea = document.querySelector('.chat-area');
+    chatArea.scrollTop = chatArea.scrollHeight;
 });
-"""
-
-# Flask route to serve the JavaScript
-def setup_js_route(app):
-    @app.route('/static/js/design.py')
-    def serve_js():
-        return get_js_content(), 200, {'Content-Type': 'text/javascript'}
\ No newline at end of file
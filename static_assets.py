@@ -0,0 +1,139 @@
+# static_assets.py
+import os
+import re
+import gzip
+import hashlib
+import logging
+from flask import Response, request, url_for, abort
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# One year, the longest max-age browsers honour
+CACHE_MAX_AGE = 31536000
+
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+_CSS_SPACE = re.compile(r'\s+')
+_CSS_PUNCT = re.compile(r'\s*([{};,])\s*')
+
+
+def minify_css(source):
+    """Strip comments and redundant whitespace from a stylesheet"""
+    css = _CSS_COMMENT.sub('', source)
+    css = _CSS_SPACE.sub(' ', css)
+    css = _CSS_PUNCT.sub(r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_js(source):
+    """
+    Conservatively shrink a script: drop indentation, blank lines and
+    full-line comments. Line breaks are kept so automatic semicolon
+    insertion still behaves the same.
+    """
+    lines = []
+    for line in source.splitlines():
+        line = line.strip()
+        if not line or line.startswith('//'):
+            continue
+        lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+class StaticAsset:
+    """A built asset with its precomputed encodings and ETag"""
+
+    def __init__(self, logical_name, content, mimetype):
+        self.logical_name = logical_name
+        self.mimetype = mimetype
+        self.body = content.encode('utf-8')
+
+        digest = hashlib.sha256(self.body).hexdigest()[:12]
+        base, ext = os.path.splitext(logical_name)
+        self.hashed_name = f"{base}.{digest}{ext}"
+        self.etag = digest
+
+        self.encodings = {
+            'gzip': gzip.compress(self.body, compresslevel=9, mtime=0),
+        }
+        if brotli is not None:
+            self.encodings['br'] = brotli.compress(self.body, quality=11)
+
+
+class StaticAssetPipeline:
+    """
+    Builds content-hashed, minified and precompressed versions of the
+    console's scripts and stylesheets once at startup and serves them with
+    immutable cache headers. Templates reference assets through the
+    ``asset_url`` helper, which resolves to the hashed name.
+    """
+
+    MINIFIERS = {
+        '.css': (minify_css, 'text/css'),
+        '.js': (minify_js, 'text/javascript'),
+    }
+
+    def __init__(self, app, url_prefix='/assets'):
+        self.app = app
+        self.url_prefix = url_prefix.rstrip('/')
+        self.logger = logging.getLogger(__name__)
+        self._by_logical = {}
+        self._by_hashed = {}
+
+        app.add_url_rule(f"{self.url_prefix}/<path:filename>", 'assets', self.serve)
+        app.jinja_env.globals['asset_url'] = self.url_for
+
+    def add_source(self, logical_name, content):
+        """Register an asset from an in-memory string"""
+        ext = os.path.splitext(logical_name)[1]
+        minify, mimetype = self.MINIFIERS.get(ext, (lambda s: s, 'application/octet-stream'))
+        asset = StaticAsset(logical_name, minify(content), mimetype)
+
+        self._by_logical[logical_name] = asset
+        self._by_hashed[asset.hashed_name] = asset
+        self.logger.info(
+            f"Built asset {logical_name} -> {asset.hashed_name} "
+            f"({len(content)} bytes source, {len(asset.body)} minified, "
+            f"{len(asset.encodings['gzip'])} gzip)"
+        )
+        return asset
+
+    def add_file(self, logical_name):
+        """Register an asset read from the Flask static folder"""
+        path = os.path.join(self.app.static_folder, *logical_name.split('/'))
+        with open(path, 'r', encoding='utf-8') as file:
+            return self.add_source(logical_name, file.read())
+
+    def url_for(self, logical_name):
+        """Resolve a logical asset name to its hashed URL"""
+        asset = self._by_logical.get(logical_name)
+        if asset is None:
+            # Unregistered assets fall back to the plain static route
+            return url_for('static', filename=logical_name)
+        return f"{self.url_prefix}/{asset.hashed_name}"
+
+    def serve(self, filename):
+        """Serve a hashed asset, honouring If-None-Match and Accept-Encoding"""
+        asset = self._by_hashed.get(filename)
+        if asset is None:
+            abort(404)
+
+        headers = {
+            'Cache-Control': f'public, max-age={CACHE_MAX_AGE}, immutable',
+            'ETag': f'"{asset.etag}"',
+            'Vary': 'Accept-Encoding',
+        }
+
+        if asset.etag in request.if_none_match:
+            return Response(status=304, headers=headers)
+
+        body = asset.body
+        for encoding in ('br', 'gzip'):
+            if encoding in asset.encodings and request.accept_encodings[encoding]:
+                body = asset.encodings[encoding]
+                headers['Content-Encoding'] = encoding
+                break
+
+        return Response(body, mimetype=asset.mimetype, headers=headers)
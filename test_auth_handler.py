@@ -0,0 +1,61 @@
+import os
+import json
+import bcrypt
+import pytest
+from auth_handler import LoginVerifier
+
+
+def write_config(path, config, mtime_ns):
+    with open(path, "w") as file:
+        json.dump(config, file)
+    # Set the mtime explicitly so every write is seen as a change
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / "config.json"
+    write_config(path, {
+        "users": {"op": bcrypt.hashpw(b"pw", bcrypt.gensalt(4)).decode()},
+        "login": {"ip_limit": [10, 60], "user_limit": [3, 60]}
+    }, 1_000_000_000)
+    return path
+
+
+@pytest.mark.parametrize("bad_config", [
+    {"users": {"new": "hash"}, "login": {"ip_limit": [1]}},
+    {"users": {"new": 123}},
+    {"users": {"new": "hash"}, "login": {"user_limit": [0, 60]}},
+    {"users": {"new": "hash"}, "login": {"max_workers": "2"}},
+    {"users": {"new": "hash"}, "login": {"timeout": -1}},
+    {"users": ["new"]},
+])
+def test_bad_reload_keeps_previous_users_and_limits(config_path, bad_config):
+    verifier = LoginVerifier(str(config_path))
+
+    write_config(config_path, bad_config, 2_000_000_000)
+    assert verifier.reload_config() is None
+
+    assert list(verifier.users) == ["op"]
+    assert (verifier.ip_limiter.max_attempts, verifier.ip_limiter.window) == (10, 60)
+    assert (verifier.user_limiter.max_attempts, verifier.user_limiter.window) == (3, 60)
+    assert verifier.verify("op", "pw", "127.0.0.1") is True
+
+
+def test_valid_reload_applies_users_and_limits(config_path):
+    verifier = LoginVerifier(str(config_path))
+
+    write_config(config_path, {
+        "users": {"op2": bcrypt.hashpw(b"x", bcrypt.gensalt(4)).decode()},
+        "login": {"ip_limit": [50, 30], "user_limit": [2, 10]}
+    }, 2_000_000_000)
+    assert verifier.reload_config() is not None
+
+    assert list(verifier.users) == ["op2"]
+    assert (verifier.ip_limiter.max_attempts, verifier.ip_limiter.window) == (50, 30)
+    assert (verifier.user_limiter.max_attempts, verifier.user_limiter.window) == (2, 10)
+
+
+def test_initial_load_failure_raises(tmp_path):
+    with pytest.raises(OSError):
+        LoginVerifier(str(tmp_path / "missing.json"))
@@ -0,0 +1,9 @@
+# wsgi.py
+# Entry point for multi-process deployments, e.g.:
+#     gunicorn -w 4 --worker-class gthread --threads 16 -b 0.0.0.0:5000 wsgi:app
+# Use a threaded worker class with more threads than the login pool size plus
+# backlog (10 by default, see auth_handler.py), so logins can never occupy
+# every thread and message polling keeps being served.
+from MorseT import create_app
+
+app = create_app()